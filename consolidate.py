@@ -1,256 +1,388 @@
 '''
 Utility script for convering /jsons/* from [govee_ble_lights (Homeassistant)](https://github.com/Beshelmek/govee_ble_lights/) to a more straightforward format in /scenes/*.
+
+The asserts aren't authoritative, they're there to alert when an
+assumption about the API dump is incorrect and requires further
+investigation. eg a property is always a certain value and can be
+safely ignored, but if it isn't that value then it must have some
+unknown informational content.
 '''
+from __future__ import annotations
+
 import os
+import sys
 import json
-from typing import Literal, NotRequired, TypedDict
-
-## Govee API dump types ##
-# Note that the mispellings are from the API dump
-
-class GoveeSceneRule(TypedDict):
-    maxSoftVersion: Literal[""]
-    minSoftVersion: Literal[""]
-    maxHardVersion: Literal[""]
-    minHardVersion: Literal[""]
-    maxWifiSoftVersion: Literal[""]
-    minWifiSoftVersion: Literal[""]
-    maxWifiHardVersion: Literal[""]
-    minWifiHardVersion: Literal[""]
-
-class GoveeEffectRule(TypedDict):
-    key: int
-    hardVersion: str
-    softVersion: str
-    wifiSoftVersion: str
-
-class GoveeSpeedInfo(TypedDict):
-    config: Literal[""]
-    speedIndex: Literal[0]
-    supSpeed: Literal[False]
-
-class GoveeSpecial(TypedDict):
-    scenceParamId: int
-    scenceParam: str
-    cmdVersion: int
-    supportSku: list[str]
-    speedInfo: GoveeSpeedInfo
-
-class GoveeEffect(TypedDict):
-    scenceParamId: int
-    scenceName: Literal["", "A", "B", "C", "D", "E", "F", "G", "H", "I"]
-    scenceParam: str
-    sceneCode: int
-    specialEffect: list[GoveeSpecial]
-    cmdVersion: int
-    sceneType: int
-    diyEffectCode: list # assert = []
-    diyEffectStr: Literal[""]
-    rules: list[GoveeEffectRule]
-    speedInfo: GoveeSpeedInfo
-
-class GoveeScene(TypedDict):
-    sceneId: int
-    iconUrls: list[str]
-    sceneName: str
-    analyticName: str
-    sceneType: int
-    sceneCode: int
-    scenceCategoryId: int
-    popUpPrompt: int
-    scenesHint: str
-    rule: GoveeSceneRule
-    lightEffects: list[GoveeEffect]
-    voiceUrl: str
-
-class GoveeCategory(TypedDict):
-    categoryId: int
-    categoryName: str
-    scenes: list[GoveeScene]
-
-class GoveeData(TypedDict):
-    categories: list[GoveeCategory]
-    supportSpeed: Literal[0]
-
-class GoveeRoot(TypedDict):
-    message: Literal['success']
-    status: Literal[200]
-    data: GoveeData
-
-## Consolidated types ##
-
-class ConsolidateSpecial(TypedDict):
-    code: int
-    param: str
-    speed: NotRequired[list[dict]]
-
-class ConsolidateEffectRule(TypedDict):
-    hardVersion: NotRequired[str]
-    softVersion: NotRequired[str]
-    wifiSoftVersion: NotRequired[str]
-
-class ConsolidateEffect(TypedDict):
-    code: int
-    param: str
-    diyCode: NotRequired[int]
-    diyParam: NotRequired[str]
-    rules: NotRequired[list[ConsolidateEffectRule]]
-    special: NotRequired[list[ConsolidateSpecial]]
-
-class ConsolidateScene(TypedDict):
-    effects: list[ConsolidateEffect]
-    hint: NotRequired[str]
+from sys import intern
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+from typing import TYPE_CHECKING
+
+try:
+    import orjson
+except ImportError:
+    class orjson: # type: ignore [no-redef]
+        '''Stdlib stand-in so orjson stays optional.'''
+        @staticmethod
+        def loads(data, _decode=json.JSONDecoder().decode):
+            # One shared decoder; skips loads()'s per-call kwarg dispatch
+            if isinstance(data, (bytes, bytearray)):
+                data = data.decode()
+            return _decode(data)
+        @staticmethod
+        def dumps(obj) -> bytes:
+            return json.dumps(obj).encode()
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# The TypedDicts are purely static annotations; keeping them behind
+# TYPE_CHECKING skips a couple dozen class creations every time a pool
+# worker imports this module.
+if TYPE_CHECKING:
+    from typing import Literal, NotRequired, TypedDict
+
+    ## Govee API dump types ##
+    # Note that the mispellings are from the API dump
+
+    class GoveeSceneRule(TypedDict):
+        maxSoftVersion: Literal[""]
+        minSoftVersion: Literal[""]
+        maxHardVersion: Literal[""]
+        minHardVersion: Literal[""]
+        maxWifiSoftVersion: Literal[""]
+        minWifiSoftVersion: Literal[""]
+        maxWifiHardVersion: Literal[""]
+        minWifiHardVersion: Literal[""]
+
+    class GoveeEffectRule(TypedDict):
+        key: int
+        hardVersion: str
+        softVersion: str
+        wifiSoftVersion: str
+
+    class GoveeSpeedInfo(TypedDict):
+        config: Literal[""]
+        speedIndex: Literal[0]
+        supSpeed: Literal[False]
+
+    class GoveeSpecial(TypedDict):
+        scenceParamId: int
+        scenceParam: str
+        cmdVersion: int
+        supportSku: list[str]
+        speedInfo: GoveeSpeedInfo
+
+    class GoveeEffect(TypedDict):
+        scenceParamId: int
+        scenceName: Literal["", "A", "B", "C", "D", "E", "F", "G", "H", "I"]
+        scenceParam: str
+        sceneCode: int
+        specialEffect: list[GoveeSpecial]
+        cmdVersion: int
+        sceneType: int
+        diyEffectCode: list # assert = []
+        diyEffectStr: Literal[""]
+        rules: list[GoveeEffectRule]
+        speedInfo: GoveeSpeedInfo
+
+    class GoveeScene(TypedDict):
+        sceneId: int
+        iconUrls: list[str]
+        sceneName: str
+        analyticName: str
+        sceneType: int
+        sceneCode: int
+        scenceCategoryId: int
+        popUpPrompt: int
+        scenesHint: str
+        rule: GoveeSceneRule
+        lightEffects: list[GoveeEffect]
+        voiceUrl: str
+
+    class GoveeCategory(TypedDict):
+        categoryId: int
+        categoryName: str
+        scenes: list[GoveeScene]
 
+    class GoveeData(TypedDict):
+        categories: list[GoveeCategory]
+        supportSpeed: Literal[0]
+
+    class GoveeRoot(TypedDict):
+        message: Literal['success']
+        status: Literal[200]
+        data: GoveeData
+
+    ## Consolidated types ##
+    # These stay TypedDicts rather than slotted dataclasses: records are
+    # streamed out as soon as they're built so almost nothing stays
+    # resident, the NotRequired keys must be *absent* (not None) in the
+    # output, and plain dicts serialize through both orjson and the
+    # stdlib shim without a custom hook.
+
+    class ConsolidateSpecial(TypedDict):
+        code: int
+        param: str
+        speed: NotRequired[list[dict]]
+
+    class ConsolidateEffectRule(TypedDict):
+        hardVersion: NotRequired[str]
+        softVersion: NotRequired[str]
+        wifiSoftVersion: NotRequired[str]
+
+    class ConsolidateEffect(TypedDict):
+        code: int
+        param: str
+        diyCode: NotRequired[int]
+        diyParam: NotRequired[str]
+        rules: NotRequired[list[ConsolidateEffectRule]]
+        special: NotRequired[list[ConsolidateSpecial]]
+
+    class ConsolidateScene(TypedDict):
+        effects: list[ConsolidateEffect]
+        hint: NotRequired[str]
+
+# Lazily evaluated, so these stay importable at runtime (govee.py uses
+# ConsolidateCategories)
 type ConsolidateScenes = dict[str, ConsolidateScene]
 type ConsolidateCategories = dict[str, ConsolidateScenes]
 
-def assert_eq(a, b):
-    if a == b:
-        return
-    raise AssertionError(f"{a!r} != {b!r}")
+EMPTY_RULE: GoveeSceneRule = {
+    "maxSoftVersion": "",
+    "minSoftVersion": "",
+    "maxHardVersion": "",
+    "minHardVersion": "",
+    "maxWifiSoftVersion": "",
+    "minWifiSoftVersion": "",
+    "maxWifiHardVersion": "",
+    "minWifiHardVersion": ""
+}
 
-def assert_oneof(a, *b):
-    if a in b:
-        return
-    raise AssertionError(f"{a!r} not in {b!r}")
-
-class Consolidate:
-    '''
-    Read the homeassistant API dumps and consolidate them into more
-    straightforward files. The asserts aren't authoritative, they're
-    there to alert when an assumption about the API dump is incorrect
-    and requires further investigation. eg a property is always a
-    certain value and can be safely ignored, but if it isn't that value
-    then it must have some unknown informational content.
-    '''
-    
-    def special(self, special: GoveeSpecial):
-        base: ConsolidateSpecial = {
-            "code": special['scenceParamId'],
-            "param": special['scenceParam']
-        }
-        
-        if special['speedInfo']['supSpeed']:
-            base['speed'] = json.loads(special['speedInfo']['config'])
-        
-        return base
-    
-    def effect_rules(self, rules: list[GoveeEffectRule]):
-        for i, rule in enumerate(rules):
-            assert_eq(rule['key'], i)
-            base: ConsolidateEffectRule = {}
-            for key in ('hardVersion', 'softVersion', 'wifiSoftVersion'):
-                if rule[key]:
-                    base[key] = rule[key]
-            yield base
-    
-    def effect(self, effect: GoveeEffect):
-        # No idea what this could be
-        assert_oneof(effect['scenceName'], "", *"ABCDEFGHI")
-        # ignoring:
-        # - scenceParamId - Internal identifier?
-        # - cmdVersion - Unknown significance
-        # - sceneType - Unknown significance
-        base: ConsolidateEffect = {
-            "code": effect['sceneCode'],
-            "param": effect['scenceParam']
-        }
-        if diyStr := effect['diyEffectStr']:
-            base['diyParam'] = diyStr
-        if diyCode := effect['diyEffectCode']:
-            base['diyCode'] = diyCode[0]
-        if rules := effect['rules']:
-            base['rules'] = list(self.effect_rules(rules))
-        if special := list(map(self.special, effect['specialEffect'])):
-            base['special'] = special
-        
-        return base
-    
-    def scene(self, scene: GoveeScene):
-        assert_eq(scene['sceneName'], scene['analyticName'])
-        assert_eq(scene['rule'], {
-            "maxSoftVersion": "",
-            "minSoftVersion": "",
-            "maxHardVersion": "",
-            "minHardVersion": "",
-            "maxWifiSoftVersion": "",
-            "minWifiSoftVersion": "",
-            "maxWifiHardVersion": "",
-            "minWifiHardVersion": ""
-        })
-        assert_eq(scene['voiceUrl'], "")
-        
-        # ignoring:
-        # - icons - List of URLs, kind of ugly, useless, and probably copyrighted
-        # - sceneType - Unknown significance
-        # - sceneCode - Internal identifier?
-        # - scenceCategoryId - Internal category id
-        # - popUpPrompt - Unknown significance, {0, 1, 2}?
-        
-        base: ConsolidateScene = {
-            "effects": list(map(self.effect, scene['lightEffects']))
-        }
-        if hint := scene['scenesHint']:
-            base['hint'] = hint
-        
-        return base
-    
-    def category(self, model: str, cat: GoveeCategory):
-        base: ConsolidateScenes = {}
-        for scene in cat['scenes']:
-            name = scene['sceneName']
-            if name in base:
-                print(f"Warning: {model} duplicates scene {cat['categoryName']} - {name}")
-                print("duplicate", name, "=", self.scene(scene))
-            else:
-                base[name] = self.scene(scene)
-        return base
-    
-    def file(self, model: str, root: GoveeRoot):
-        base: ConsolidateCategories = {}
-        for cat in root['data']['categories']:
-            name = cat['categoryName']
-            if name in base:
-                print(f"Warning: {model} duplicates category {name}")
-                print("duplicate", name, "=", self.category(model, cat))
-            else:
-                base[name] = self.category(model, cat)
-        return base
-    
-    def all(self, root: str):
-        # Iterate over ./jsons/
-        for file in os.listdir(root):
-            name, ext = os.path.splitext(file)
-            if ext != '.json':
-                continue
-            with open(f'{root}/{file}') as f:
-                data: GoveeRoot = json.load(f)
-            
+VALID_SCENCE_NAMES = frozenset("ABCDEFGHI") | {""}
+
+# These are all pure functions, so they're kept at module level - bound
+# method dispatch is pure overhead in the per-effect loops.
+
+# itemgetters pull all the fields a function needs in one C call
+# instead of a dict lookup per subscript
+_get_special = itemgetter('scenceParamId', 'scenceParam', 'speedInfo')
+_get_effect = itemgetter(
+    'scenceName', 'sceneCode', 'scenceParam',
+    'diyEffectStr', 'diyEffectCode', 'rules', 'specialEffect'
+)
+_get_scene = itemgetter(
+    'sceneName', 'analyticName', 'rule', 'voiceUrl',
+    'lightEffects', 'scenesHint'
+)
+
+_load_config = lru_cache(maxsize=None)(orjson.loads)
+'''Govee ships a few canonical speed configs reused across many
+effects, so each unique config string is only parsed once.'''
+
+@lru_cache(maxsize=None)
+def _special_cached(code: int, param: str,
+    sup_speed: bool, config: str) -> ConsolidateSpecial:
+    base: ConsolidateSpecial = {
+        "code": code,
+        # Interned so duplicate blobs across SKUs share storage
+        "param": intern(param)
+    }
+
+    if sup_speed:
+        base['speed'] = _load_config(config)
+
+    return base
+
+def special(spec: GoveeSpecial):
+    code, param, speed_info = _get_special(spec)
+    # Identical specials repeat across scenes; the dicts are never
+    # mutated downstream so sharing the cached one is safe
+    return _special_cached(
+        code, param, speed_info['supSpeed'], speed_info['config']
+    )
+
+_RULE_KEYS = ('hardVersion', 'softVersion', 'wifiSoftVersion')
+
+def effect_rules(rules: list[GoveeEffectRule]) -> list[ConsolidateEffectRule]:
+    for i, rule in enumerate(rules):
+        if rule['key'] != i:
+            raise AssertionError(f"{rule['key']!r} != {i!r}")
+    return [
+        {key: val for key in _RULE_KEYS if (val := rule.get(key))} # type: ignore [misc]
+        for rule in rules
+    ]
+
+# The default args below partially evaluate the transform at def time:
+# globals become frame-local constants, which is as far as specializing
+# a fixed-schema projection can go without exec()-generated code.
+def effect(eff: GoveeEffect, *,
+    _get_effect=_get_effect, _valid=VALID_SCENCE_NAMES, _intern=intern):
+    name, code, param, diyStr, diyCode, rules, specialEffect = _get_effect(eff)
+    # No idea what this could be
+    if name not in _valid:
+        raise AssertionError(f"{name!r} not in {_valid!r}")
+    # ignoring:
+    # - scenceParamId - Internal identifier?
+    # - cmdVersion - Unknown significance
+    # - sceneType - Unknown significance
+    base: ConsolidateEffect = {
+        "code": code,
+        # Interned so duplicate blobs across SKUs share storage
+        "param": _intern(param)
+    }
+    if diyStr:
+        base['diyParam'] = diyStr
+    if diyCode:
+        base['diyCode'] = diyCode[0]
+    if rules:
+        base['rules'] = effect_rules(rules)
+    if specialEffect:
+        base['special'] = [special(s) for s in specialEffect]
+
+    return base
+
+def scene(scn: GoveeScene, *, _get_scene=_get_scene, _empty=EMPTY_RULE):
+    name, analytic, rule, voiceUrl, lightEffects, hint = _get_scene(scn)
+    # The whole validation block is inline so the happy path is three
+    # compares with no function calls
+    if name != analytic:
+        raise AssertionError(f"{name!r} != {analytic!r}")
+    if rule != _empty:
+        raise AssertionError(f"{rule!r} != {_empty!r}")
+    if voiceUrl != "":
+        raise AssertionError(f"{voiceUrl!r} != ''")
+
+    # ignoring:
+    # - icons - List of URLs, kind of ugly, useless, and probably copyrighted
+    # - sceneType - Unknown significance
+    # - sceneCode - Internal identifier?
+    # - scenceCategoryId - Internal category id
+    # - popUpPrompt - Unknown significance, {0, 1, 2}?
+
+    base: ConsolidateScene = {
+        "effects": list(map(effect, lightEffects))
+    }
+    if hint:
+        base['hint'] = hint
+
+    return base
+
+def category(model: str, cat: GoveeCategory, warnings: list[str]):
+    base: ConsolidateScenes = {}
+    for scn in cat['scenes']:
+        name = scn['sceneName']
+        if name in base:
+            warnings.append(f"Warning: {model} duplicates scene {cat['categoryName']} - {name}")
+            warnings.append(f"duplicate {name} = {scene(scn)}")
+        else:
+            base[name] = scene(scn)
+    return base
+
+def file(model: str, root: GoveeRoot, warnings: list[str]):
+    base: ConsolidateCategories = {}
+    for cat in root['data']['categories']:
+        name = cat['categoryName']
+        if name in base:
+            warnings.append(f"Warning: {model} duplicates category {name}")
+            warnings.append(f"duplicate {name} = {category(model, cat, warnings)}")
+        else:
+            base[name] = category(model, cat, warnings)
+    return base
+
+def stream_file(model: str, f, fd: int, warnings: list[str]):
+    '''Stream categories out of a dump one at a time, writing each
+    consolidated category as soon as it's built so neither the input
+    tree nor the output dict is ever fully live.'''
+    base = b'{'
+    seen = set()
+    # use_float so numbers come out orjson-serializable, not Decimal
+    for cat in ijson.items(f, 'data.categories.item', use_float=True):
+        name = cat['categoryName']
+        if name in seen:
+            warnings.append(f"Warning: {model} duplicates category {name}")
+            warnings.append(f"duplicate {name} = {category(model, cat, warnings)}")
+            continue
+        seen.add(name)
+        # One coalesced syscall per category
+        os.writev(fd, [
+            base, orjson.dumps(name), b':',
+            orjson.dumps(category(model, cat, warnings))
+        ])
+        base = b','
+    os.write(fd, b'}\n' if seen else b'{}\n')
+
+def _process_one(in_path: str, out_path: str):
+    '''Read, consolidate, and write a single dump file. Top-level so the
+    process pool can pickle it.'''
+    fname = os.path.basename(in_path)
+    model = os.path.splitext(fname)[0]
+
+    # Buffered so parallel workers emit one write each instead of
+    # interleaving per-warning prints
+    warnings: list[str] = []
+    fd = os.open(out_path, os.O_WRONLY|os.O_CREAT|os.O_TRUNC, 0o644)
+    try:
+        if ijson is not None:
+            # Incremental parse keeps peak RSS at one category, not the
+            # whole dump
+            with open(in_path, 'rb') as f:
+                stream_file(model, f, fd, warnings)
+        else:
+            # Fallback: single-shot read in one syscall
+            in_fd = os.open(in_path, os.O_RDONLY)
             try:
-                consolidate = self.file(name, data)
-            except Exception as e:
-                e.add_note(f'File: {file}')
-                raise
-            
-            with open(f'scenes/{name}.json', 'w') as f:
-                json.dump(consolidate, f)
-    
-    def summarize(self, data):
-        for dev, cats in data.items():
-            print(dev)
-            for cname, cat in cats.items():
-                print(f"  Category: {cname} {cat['id']}")
-                for scene in cat['scenes']:
-                    if scene['code']:
-                        print(f"    Scene: {scene['name']} 0x{scene['code']:04X}")
-                    else:
-                        print(f"    Scene: {scene['name']}")
-                    for effect in scene['effects']:
-                        print(f"      Effect: 0x{effect['code']:04X} {effect['param']}")
+                buf = os.read(in_fd, os.fstat(in_fd).st_size)
+            finally:
+                os.close(in_fd)
+
+            os.write(fd, orjson.dumps(
+                file(model, orjson.loads(buf), warnings)
+            ) + b'\n')
+    except Exception as e:
+        e.add_note(f'File: {fname}')
+        raise
+    finally:
+        os.close(fd)
+
+    if warnings:
+        sys.stderr.write("\n".join(warnings) + "\n")
+
+def consolidate_all(root: str):
+    # Iterate over ./jsons/ - sorted for deterministic output
+    with os.scandir(root) as it:
+        entries = sorted(it, key=lambda e: e.name)
+
+    pairs = [
+        (entry.path, f"scenes/{os.path.splitext(entry.name)[0]}.json")
+            for entry in entries
+            if entry.name.endswith('.json')
+    ]
+    if not pairs:
+        return
+
+    # Each file is independent, so fan the parse+build out to all cores
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+        for _ in pool.map(_process_one, *zip(*pairs), chunksize=8):
+            pass
+
+def summarize(data):
+    for dev, cats in data.items():
+        print(dev)
+        for cname, cat in cats.items():
+            print(f"  Category: {cname} {cat['id']}")
+            for scn in cat['scenes']:
+                if scn['code']:
+                    print(f"    Scene: {scn['name']} 0x{scn['code']:04X}")
+                else:
+                    print(f"    Scene: {scn['name']}")
+                for eff in scn['effects']:
+                    print(f"      Effect: 0x{eff['code']:04X} {eff['param']}")
 
 def main():
-    c = Consolidate()
-    c.all("jsons")
+    consolidate_all("jsons")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -6,16 +6,23 @@ from typing import Awaitable, Callable, Coroutine, Final, Generator, Iterable, L
 from bleak import BleakScanner, BleakClient
 from aioconsole import ainput
 import re
+import struct
+import sys
 import traceback as tb
 import logging
 import time
 import json
 import binascii
-from functools import cached_property
+from functools import cached_property, lru_cache
 import math
 
 from consolidate import ConsolidateCategories
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 _LOGGER = logging.getLogger(__name__)
 _LOGGER.setLevel(logging.DEBUG)
 _LOGGER.addHandler(logging.StreamHandler())
@@ -88,6 +95,9 @@ UNK_REG_ff: Final = 0xff
 MULTI_REG: Final = {REG_INFO, REG_BUFFER}
 '''Registers with multiple sub-registers.'''
 
+VALID_CMDS: Final = frozenset({CMD_READ, CMD_WRITE, CMD_MULTI})
+'''Commands we expect to see echoed in notifications.'''
+
 MODE_SCENE: Final = 0x04
 '''Mode register scene value.'''
 
@@ -114,6 +124,9 @@ MAX_DIM: Final = 100
 MAX_MESSAGE: Final = 20
 '''Largest size of a message (including checksum).'''
 
+SCAN_CACHE: Final = '.govee_cache.json'
+'''Last-seen device names/addresses, for reconnecting without a scan.'''
+
 MIN_TEMP: Final = 2000
 '''Minimum color temperature.'''
 MAX_TEMP: Final = 8800
@@ -185,16 +198,16 @@ type BytesLike = None|bool|int|Iterable[int]
 
 COLOR_UNDEFINED: Final[RGB] = (1, 1, 1)
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ColorMode:
     '''Technically just segment mode with all colors the same.'''
     color: ARGB
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SegmentMode:
     segments: list[ARGB]
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SceneMode:
     code: int
     name: str
@@ -211,15 +224,26 @@ def assert_rgb(rgb: RGB):
     assert_range(rgb[2], "Blue", 0, 255)
 
 def conv_byte(*bs: BytesLike) -> Generator[int, None, None]:
+    # A lone bytes-like payload needs no per-element dispatch
+    if len(bs) == 1 and type(bs[0]) in (bytes, bytearray, memoryview):
+        yield from bs[0] # type: ignore [misc]
+        return
     for b in bs:
-        match b:
-            case int()|bool(): yield int(b)
-            case None: pass
-            case _ if isinstance(b, Iterable):
-                yield from b
-            
-            case _:
-                raise TypeError(f"Invalid type for byte conversion: {type(b)}")
+        # type-is checks are pointer compares, cheaper than the match
+        # statement's __instancecheck__ per element
+        t = type(b)
+        if t is int:
+            yield b
+        elif t is bool:
+            yield int(b)
+        elif b is None:
+            pass
+        elif isinstance(b, Iterable):
+            yield from b
+        elif isinstance(b, int): # int subclasses, eg enums
+            yield int(b)
+        else:
+            raise TypeError(f"Invalid type for byte conversion: {type(b)}")
 
 def print_conv(*bs: BytesLike):
     conv = bytes(conv_byte(*bs))
@@ -227,55 +251,71 @@ def print_conv(*bs: BytesLike):
         *conv, *[0]*(MAX_MESSAGE - 1 - len(conv)), checksum(conv)
     ]).hex())
 
-def register(reg: int):
+def register(reg: int) -> bytes:
     if reg > 0xff:
-        yield reg >> 8
-    yield reg & 0xff
+        return bytes([reg >> 8, reg & 0xff])
+    return bytes([reg])
 
 def saturate(v, min, max):
     return min if v < min else max if v > max else v
 
+@lru_cache(maxsize=256)
 def kelvin_rgb(T):
     """
     Converts from K to RGB, algorithm courtesy of
     http://www.tannerhelland.com/4435/convert-temperature-rgb-algorithm-code/
+
+    Cached: a temperature sweep across segments repeats the same few
+    hundred kelvin values, so the log/pow math runs once per unique T.
     """
-    T = saturate(T, MAX_TEMP, MIN_TEMP) / 100
-    r = saturate(329.699 * (T - 60)**-0.133, 0, 0xff)
-    
+    T = saturate(T, MIN_TEMP, MAX_TEMP) / 100
+
     if T <= 66:
-        g = 99.47 * math.log(T) - 161.122
+        r = 0xff
+        g = saturate(99.47 * math.log(T) - 161.122, 0, 0xff)
     else:
-        g = 288.122 * (T - 60)**-0.076
-    g = saturate(g, 0, 0xff)
-    
-    b = saturate(138.518 * math.log(T - 10) - 305.045, 0, 0xff)
+        r = saturate(329.699 * (T - 60)**-0.133, 0, 0xff)
+        g = saturate(288.122 * (T - 60)**-0.076, 0, 0xff)
+
+    if T >= 66:
+        b = 0xff
+    elif T <= 19:
+        b = 0
+    else:
+        b = saturate(138.518 * math.log(T - 10) - 305.045, 0, 0xff)
 
     return int(r), int(g), int(b)
 
 def checksum(data: bytes|bytearray):
+    '''XOR checksum, folded 8 bytes per step instead of 1.'''
+    if pad := -len(data) % 8:
+        data = bytes(data) + b'\0'*pad
     cs = 0
-    for b in data:
-        cs ^= b
-    return cs
-
-def batch_bytes(data: bytes, size: int):
+    for q in struct.unpack(f'<{len(data)//8}Q', data):
+        cs ^= q
+    cs ^= cs >> 32
+    cs ^= cs >> 16
+    cs ^= cs >> 8
+    return cs & 0xff
+
+def batch_bytes(data: bytes|memoryview, size: int):
+    # Slicing a memoryview here is zero-copy
     for i in range(0, len(data), size):
         yield data[i:i + size]
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class EffectRuleSchema:
     hardVersion: str
     softVersion: str
     wifiSoftVersion: str
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SpecialSchema:
     code: int
     param: bytes
     speed: list[dict]
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class EffectSchema:
     code: int
     param: bytes
@@ -290,7 +330,7 @@ class EffectSchema:
         else:
             return self.code
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SceneSchema:
     name: str
     category: str
@@ -303,7 +343,7 @@ class SceneSchema:
             summary = summary[0]
         return {self.name: summary} if name else summary
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class CategorySchema:
     name: str
     scenes: dict[str, SceneSchema]
@@ -319,46 +359,43 @@ def detitle(title: str):
     return re.sub(r"\W", "", title.lower())
 
 class SceneInfo:
+    __slots__ = ('by_id', 'scenes', 'categories')
+
     by_id: dict[int, SceneSchema]
     scenes: dict[str, SceneSchema]
     categories: dict[str, CategorySchema]
     
     def __init__(self, fname: str):
         try:
-            with open(fname) as f:
-                raw: ConsolidateCategories = json.load(f)
+            with open(fname, 'rb') as f:
+                data = f.read()
+            raw: ConsolidateCategories = (
+                json.loads(data) if orjson is None else orjson.loads(data)
+            )
         except FileNotFoundError:
             _LOGGER.warning("Scene info not found: %s", fname)
             raw = {}
-        except json.JSONDecodeError:
+        except (json.JSONDecodeError, ValueError):
             _LOGGER.warning("Scene info not valid JSON: %s", fname)
             raw = {}
-        
+
         self.by_id = {}
         self.scenes = {}
         self.categories = {}
+        # Local binding shortcuts the attribute lookup in the
+        # comprehensions below
+        _b64 = binascii.a2b_base64
         for cat_title, scenes in raw.items():
             cat_name = detitle(cat_title)
             cat_scenes = {}
             self.categories[cat_name] = CategorySchema(cat_title, cat_scenes)
             for scene_title, scene in scenes.items():
                 scene_name = detitle(scene_title)
-                scene_effects: list[EffectSchema] = []
-                new = SceneSchema(
-                    scene_title, cat_title,
-                    scene_effects, scene.get('hint', "")
-                )
-                self.scenes[scene_name] = new
-                cat_scenes[scene_name] = new
-                
-                for effect in scene['effects']:
-                    if code := effect.get('code'):
-                        self.by_id[code] = new
-                    
-                    scene_effects.append(EffectSchema(
-                        code, binascii.a2b_base64(effect['param']),
+                scene_effects = [
+                    EffectSchema(
+                        effect.get('code'), _b64(effect['param']),
                         effect.get('diyCode', 0),
-                        binascii.a2b_base64(effect.get('diyParam', "")),
+                        _b64(effect.get('diyParam', "")),
                         [
                             EffectRuleSchema(
                                 rule.get('hardVersion', ""),
@@ -370,12 +407,24 @@ class SceneInfo:
                         [
                             SpecialSchema(
                                 special['code'],
-                                binascii.a2b_base64(special['param']),
+                                _b64(special['param']),
                                 special.get('speed', [])
                             )
                             for special in effect.get('special', [])
                         ]
-                    ))
+                    )
+                    for effect in scene['effects']
+                ]
+                new = SceneSchema(
+                    scene_title, cat_title,
+                    scene_effects, scene.get('hint', "")
+                )
+                self.scenes[scene_name] = new
+                cat_scenes[scene_name] = new
+
+                for effect_schema in scene_effects:
+                    if effect_schema.code:
+                        self.by_id[effect_schema.code] = new
     
     def get_scene(self, name: str|int) -> Optional[SceneSchema]:
         '''Get a scene by id, name, or category - name.'''
@@ -397,6 +446,9 @@ class SceneInfo:
                 for cat in self.categories.values()
         }
 
+ARGB_STRUCT: Final = struct.Struct('<BBBB')
+'''Packed layout of one color-buffer entry (brightness + rgb).'''
+
 def parse_packet(data: bytes):
     cmd = data[0]
     ro = ro = 1 if cmd == CMD_MULTI else 2 + (data[1] in MULTI_REG)
@@ -409,8 +461,10 @@ class GoveeLight:
     '''Bluetooth client.'''
     pending: asyncio.Queue[bytes]
     '''Queue of commands pending a response.'''
-    futures: defaultdict[bytes, list[asyncio.Future[bytes]]]
-    '''Map of commands to their listeners.'''
+    futures: dict[bytes, asyncio.Future[bytes]]
+    '''Map of commands to their listeners. Concurrent requests on the
+    same register share one future, since a response resolves them all
+    at once anyway.'''
     subscribed: defaultdict[str, list[Callable]]
     '''Map of event subscriptions.'''
     state: dict[int, bytes]
@@ -425,9 +479,13 @@ class GoveeLight:
         self.tg = asyncio.TaskGroup()
         self.client = BleakClient(address)
         self.pending = asyncio.Queue()
-        self.futures = defaultdict(list)
+        self.futures = {}
         self.subscribed = defaultdict(list)
         self.state = {}
+        # Reused per light; sends don't interleave between fill and write
+        self._send_buf = bytearray(MAX_MESSAGE)
+        # (cmd, reg) -> key bytes; the heartbeat hits this every 2s
+        self._target_cache: dict[tuple[int, int], bytes] = {}
     
     async def __aenter__(self):
         await self.tg.__aenter__()
@@ -448,16 +506,24 @@ class GoveeLight:
             self.emit("error", "checksum", bytes(ba))
             return _LOGGER.error("Checksum error: %s", ba.hex())
         
-        data = bytes(ba[:-1].rstrip(b'\0'))
+        # Strip checksum + zero padding by index so the packet is
+        # copied once, not three times
+        end = len(ba) - 1
+        while end > 0 and ba[end - 1] == 0:
+            end -= 1
+        if end == 0:
+            return _LOGGER.error("Empty data: %s", ba.hex())
+        data = bytes(ba[:end])
         cmd = data[0]
         
-        if cmd not in {CMD_READ, CMD_WRITE, CMD_MULTI}:
+        if cmd not in VALID_CMDS:
             return _LOGGER.error("Unexpected data: %s", data.hex())
-        
+
         cmd, key, val = parse_packet(data)
         if cmd == CMD_READ:
             self.state[int.from_bytes(key[1:])] = bytes(val)
-            if key[1] != REG_POWER:
+            # hex() isn't free; skip it unless debug logging is live
+            if key[1] != REG_POWER and _LOGGER.isEnabledFor(logging.DEBUG):
                 _LOGGER.debug("Notify (%s): %s", key.hex(), val.hex())
         else:
             _LOGGER.warning("Unknown notify: %s", data.hex())
@@ -470,15 +536,15 @@ class GoveeLight:
                 break
             
             self.emit("error", "timeout", nkey)
-            for future in self.futures.pop(nkey, []):
+            if (future := self.futures.pop(nkey, None)) and not future.done():
                 future.set_exception(
                     TimeoutError("Another response received first")
                 )
         else:
             self.emit("error", "unexpected", key)
             return _LOGGER.warning("Unexpected response: %s", data)
-        
-        for future in self.futures.pop(key, []):
+
+        if (future := self.futures.pop(key, None)) and not future.done():
             future.set_result(val)
     
     @overload
@@ -512,8 +578,12 @@ class GoveeLight:
             raise ValueError("Command too long")
         k, v, d = parse_packet(data)
         self.emit("send", k, int.from_bytes(v[1:]), d)
-        data += bytes([*[0]*(19 - len(data)), checksum(data)])
-        await self.client.write_gatt_char(CHAR_SEND, data)
+        # Pack in place instead of allocating intermediates per send
+        buf = self._send_buf
+        buf[:len(data)] = data
+        buf[len(data):] = bytes(MAX_MESSAGE - len(data))
+        buf[-1] = checksum(memoryview(buf)[:-1])
+        await self.client.write_gatt_char(CHAR_SEND, bytes(buf))
     
     async def send_data(self, *parts: BytesLike):
         '''Send data with zero padding and checksum.'''
@@ -521,11 +591,11 @@ class GoveeLight:
     
     async def send_read(self, reg: int):
         '''Raw read without awaiting response.'''
-        await self.send_data(CMD_READ, *register(reg))
+        await self.send_data(CMD_READ, register(reg))
     
     async def send_write(self, reg: int, *parts: BytesLike):
         '''Raw write without awaiting response.'''
-        await self.send_data(CMD_WRITE, *register(reg), *parts)
+        await self.send_data(CMD_WRITE, register(reg), *parts)
     
     async def heartbeat(self):
         '''
@@ -547,12 +617,14 @@ class GoveeLight:
         PAYLOAD = MAX_MESSAGE - 1 - 1 - 1 # command, packet, checksum
         INIT = PAYLOAD - 1 - 1 - 1 # 01, count, 02
         chunks = (len(data) - INIT + (PAYLOAD - 1)) // PAYLOAD
-        
-        #print_conv(CMD_MULTI, 0, 1, chunks + 1, 2, data[:INIT])
-        await self.send_data(CMD_MULTI, 0, 1, chunks + 1, 2, data[:INIT])
-        
+
+        # Views, not copies - scene params can span many packets
+        mv = memoryview(data)
+        #print_conv(CMD_MULTI, 0, 1, chunks + 1, 2, mv[:INIT])
+        await self.send_data(CMD_MULTI, 0, 1, chunks + 1, 2, mv[:INIT])
+
         # All others: a3 i ...data checksum
-        for i, chunk in enumerate(batch_bytes(data[INIT:], PAYLOAD), 1):
+        for i, chunk in enumerate(batch_bytes(mv[INIT:], PAYLOAD), 1):
             if i == chunks:
                 i = 0xff # Last packet has index 0xff
             #print_conv(CMD_MULTI, i, chunk)
@@ -560,10 +632,15 @@ class GoveeLight:
     
     async def _ack(self, cmd: int, reg: int, send: Coroutine) -> bytes:
         '''Read with response or write with ACK.'''
-        target = bytes([cmd, *register(reg)])
+        if (target := self._target_cache.get((cmd, reg))) is None:
+            if reg > 0xff:
+                target = bytes([cmd, reg >> 8, reg & 0xff])
+            else:
+                target = bytes([cmd, reg])
+            self._target_cache[cmd, reg] = target
         await self.pending.put(target)
-        future = asyncio.Future()
-        self.futures[target].append(future)
+        if (future := self.futures.get(target)) is None:
+            self.futures[target] = future = asyncio.Future()
         await send
         return await future
     
@@ -608,15 +685,20 @@ class GoveeLight:
         mode = await self.cache_read(REG_MODE)
         m = mode[0]
         if m == MODE_SCENE:
-            index = int.from_bytes(mode[1:], 'little')
+            # Codes are 1-2 bytes after the zero padding is stripped;
+            # shifts beat int.from_bytes at this size
+            match len(mode):
+                case 2: index = mode[1]
+                case 3: index = mode[1] | mode[2]<<8
+                case _: index = int.from_bytes(mode[1:], 'little')
             name = SCENE_NAME.get(index, "Unknown")
             return SceneMode(index, name)
         
         if m == MODE_SEGMENT:
             segments = await self.get_segments()
-            s0 = segments[0]
-            if all(s == s0 for s in segments):
-                return ColorMode(s0)
+            # count() is one C-level sweep, no generator frame resumes
+            if segments.count(segments[0]) == len(segments):
+                return ColorMode(segments[0])
             else:
                 return SegmentMode(segments)
         
@@ -673,55 +755,120 @@ class GoveeLight:
     async def get_segments(self, segments: int=-1):
         '''Get the colors of all segments.'''
         segments &= 0x7fff
-        return [
-            ARGB(*await self.get_buffer(i + SEGMENT_OFFSET))
+        # Fetch each needed sub-register once (max 5) instead of going
+        # through get_buffer per segment, then slice the ARGBs out
+        regs = sorted({
+            (i + SEGMENT_OFFSET) // SUBREGISTER_COLORS
                 for i in range(SEGMENT_COUNT)
                 if segments & (1 << i)
-        ]
-    
+        })
+        # Pipelined: the link can have several reads outstanding per
+        # connection interval, and responses come back in send order
+        bufs = dict(zip(regs, await asyncio.gather(
+            *(self.cache_read(REG_BUFFER<<8 | r) for r in regs)
+        )))
+        for r, buf in bufs.items():
+            # Zero-stripped responses can cut a trailing color short;
+            # re-pad so the fixed layout always unpacks
+            if len(buf) < 4*SUBREGISTER_COLORS:
+                bufs[r] = buf.ljust(4*SUBREGISTER_COLORS, b'\0')
+        out = []
+        for i in range(SEGMENT_COUNT):
+            if segments & (1 << i):
+                r, c = divmod(i + SEGMENT_OFFSET, SUBREGISTER_COLORS)
+                # Compiled unpack straight from the buffer, no slice
+                out.append(ARGB._make(ARGB_STRUCT.unpack_from(bufs[r], 4*c)))
+        return out
+    
+    # Payload templates with the fixed bytes pre-filled; per call only
+    # the color/value and segment slots are overwritten
+    _COLOR_TEMPLATE: Final = bytes([
+        MODE_SEGMENT, MODE_SEGMENT_COLOR, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
+    ])
+    _BRIGHT_TEMPLATE: Final = bytes([
+        MODE_SEGMENT, MODE_SEGMENT_BRIGHT, 0, 0, 0
+    ])
+
     async def set_color(self, rgb: RGB, segments: int=-1):
         '''Set the color of the light.'''
         assert_rgb(rgb)
-        await self.write(
-            REG_MODE, MODE_SEGMENT, MODE_SEGMENT_COLOR, *rgb,
-            b'\0'*5,
-            self.expand_segments(segments)
-        )
-    
+        buf = bytearray(self._COLOR_TEMPLATE)
+        buf[2:5] = bytes(rgb)
+        buf[10:12] = self.expand_segments(segments)
+        await self.write(REG_MODE, buf)
+
     async def set_brightness(self, value: float, segments: int=-1):
         '''Set the brightness of the light.'''
         assert_range(value, "Brightness", 0, 1)
-        await self.write(
-            REG_MODE, MODE_SEGMENT, MODE_SEGMENT_BRIGHT,
-            round(value*(MAX_DIM - MIN_BRIGHT)) + MIN_BRIGHT,
-            self.expand_segments(segments)
-        )
+        buf = bytearray(self._BRIGHT_TEMPLATE)
+        buf[2] = round(value*(MAX_DIM - MIN_BRIGHT)) + MIN_BRIGHT
+        buf[3:5] = self.expand_segments(segments)
+        await self.write(REG_MODE, buf)
 
 @asynccontextmanager
 async def scan():
-    print("Scanning...")
-    for dev in await BleakScanner.discover():
-        if dev.name is None:
+    '''Connect to the first available Govee light, trying devices seen
+    in previous sessions before paying for a full discovery scan.'''
+    try:
+        with open(SCAN_CACHE) as f:
+            seen: dict[str, str] = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        seen = {}
+
+    for name, address in seen.items():
+        light = GoveeLight(name, address)
+        try:
+            await light.__aenter__()
+        except Exception:
+            _LOGGER.info("Cached light %s unreachable, rescanning", address)
             continue
-        if GOVEE_RE.match(dev.name):
-            async with GoveeLight(dev.name, dev.address) as light:
-                yield light
-    raise RuntimeError("No Govee light found")
+        try:
+            yield light
+        except BaseException:
+            if not await light.__aexit__(*sys.exc_info()):
+                raise
+        else:
+            await light.__aexit__(None, None, None)
+        return
+
+    print("Scanning...")
+    found: asyncio.Future = asyncio.Future()
+    def _on_adv(dev, adv):
+        if not found.done() and dev.name and GOVEE_RE.match(dev.name):
+            found.set_result(dev)
+
+    # The service filter keeps unrelated advertisers out in the OS
+    # stack, and the callback stops the scan at the first hit instead
+    # of sitting out the whole discovery window
+    async with BleakScanner(_on_adv, service_uuids=[SERVICE_REGISTERS]):
+        try:
+            dev = await asyncio.wait_for(found, timeout=10)
+        except TimeoutError:
+            raise RuntimeError("No Govee light found") from None
+
+    seen[dev.name] = dev.address
+    with open(SCAN_CACHE, 'w') as f:
+        json.dump(seen, f)
+    async with GoveeLight(dev.name, dev.address) as light:
+        yield light
+
+# One compiled pass over the command instead of three re.sub calls
+ASM_RE: Final = re.compile(r'^(?:r(?:ead)?|w(?:rite)?)|\bscene\b|\bparam\b')
+ASM_SUBS: Final = {
+    'r': 'aa', 'read': 'aa',
+    'w': '33', 'write': '33',
+    'scene': '0504',
+    'param': '04'
+}
 
 def asm_cmd(cmd: Optional[str|bytes]):
     if cmd is None:
         return b""
-    
+
     if isinstance(cmd, (bytes, bytearray)):
         return bytes(cmd)
-    
-    cmd = re.sub(
-        r"^(r(?:ead)?|w(?:rite)?)",
-        lambda m: {'r': 'aa', 'w': '33'}[m[1]],
-        cmd
-    )
-    cmd = re.sub(r'\bscene\b', '0504', cmd)
-    cmd = re.sub(r'\bparam\b', '04', cmd)
+
+    cmd = ASM_RE.sub(lambda m: ASM_SUBS[m[0]], cmd)
     print("Asm:", cmd)
     return bytes.fromhex(cmd.replace(' ', ''))
 
@@ -751,7 +898,7 @@ def parse_cmd(cmd: str):
         if m := RANGE_RE.match(part):
             start, end = m.groups()
             if end is None:
-                yield asm_cmd(prefix + asm_cmd(start))
+                yield prefix + asm_cmd(start) + suffix
             else:
                 for i in range(int(start, 16), int(end, 16) + 1):
                     yield prefix + bytes([i]) + suffix